@@ -1,5 +1,45 @@
 # heuristics.py
 
+from functools import lru_cache
+
+from .rules import make_tables
+
+
+@lru_cache(maxsize=None)
+def _lrv_scores(N):
+    """LRV reward indexed by the number of remaining options of a square (0..N)"""
+    # TODO: move to config
+    # 0 options: impossible state, bad move to be here
+    # 1 option: single (very safe lol), 2 options: strong move, more: lower returns for risky moves
+    return (-10.0, 5.0, 2.0) + tuple(1.0 / options for options in range(3, N + 1))
+
+
+# largest board size for which the LRV reward is tabulated per used-values mask (2^N entries)
+MAX_MASK_TABLE_N = 16
+
+
+class _LrvByPopcount:
+    """Fallback for _lrv_by_mask on boards too large to tabulate: computes the reward per lookup"""
+    def __init__(self, N):
+        self.N = N
+        self.scores = _lrv_scores(N)
+
+    def __getitem__(self, used_mask):
+        return self.scores[self.N - used_mask.bit_count()]
+
+
+@lru_cache(maxsize=None)
+def _lrv_by_mask(N):
+    """
+    LRV reward indexed directly by the combined row/col/block used-values mask of a square, i.e. the popcount
+    and the score mapping folded into one lookup, specialized once per board size (512 entries for 9x9)
+    """
+    if N > MAX_MASK_TABLE_N:
+        return _LrvByPopcount(N)
+    scores = _lrv_scores(N)
+    return tuple(scores[N - used_mask.bit_count()] for used_mask in range(1 << N))
+
+
 class Heuristics:
     """
     Stateless heuristics module for our agent
@@ -10,57 +50,49 @@ class Heuristics:
         Scan the board and return the status of all rows, columns and blocks
         :param board: 1D array of integers representing the grid
         :param N: total size of the grid (NxN)
-        :param n: number of rows in a block (block height)
-        :param m: number of columns in a block (block width)
+        :param n: number of columns in a block (block width)
+        :param m: number of rows in a block (block height)
         """
 
-        # data structures to store region properties
-        rows = [{'zeros': 0, 'empty_indices': [], 'used_mask': 0} for _ in range(N)]
-        cols = [{'zeros': 0, 'empty_indices': [], 'used_mask': 0} for _ in range(N)]
-        blocks = [{'zeros': 0, 'empty_indices': [], 'used_mask': 0} for _ in range(N)]
-
-        # blocks per row (how many blocks fit horizontally) grid is N, block width is m
-        blocks_per_row = N // m
-
-        for r in range(N):
-            for c in range(N):
-                idx = r * N + c
-                val = board[idx]
-
-                # calculate block index
-                b_row = r // n
-                b_col = c // m
-                b_idx = b_row * blocks_per_row + b_col
-
-                if val == 0:
-                    # update row
-                    rows[r]['zeros'] += 1
-                    rows[r]['empty_indices'].append((r, c))
-
-                    # update col
-                    cols[c]['zeros'] += 1
-                    cols[c]['empty_indices'].append((r, c))
-
-                    # update block
-                    blocks[b_idx]['zeros'] += 1
-                    blocks[b_idx]['empty_indices'].append((r, c))
-                else:  # update bitmasks (for heuristic 3)
-                    # shift 1 by (val-1) so: 1→bit0, 2→bit1,....
-                    mask = 1 << (val - 1)
-                    rows[r]['used_mask'] |= mask
-                    cols[c]['used_mask'] |= mask
-                    blocks[b_idx]['used_mask'] |= mask
-
-        return {'rows': rows, 'cols': cols, 'blocks': blocks}
+        # flat int lists per region family (structure of arrays):
+        # zeros = number of empty cells, first_empty = (r, c) of the first empty cell or None,
+        # mask = bitmask of the values already placed
+        row_zeros, row_first, row_mask = [0] * N, [None] * N, [0] * N
+        col_zeros, col_first, col_mask = [0] * N, [None] * N, [0] * N
+        block_zeros, block_first, block_mask = [0] * N, [None] * N, [0] * N
+
+        block_idx, row_of, col_of, _ = make_tables(m, n)
+
+        for val, r, c, b_idx in zip(board, row_of, col_of, block_idx):
+            if val == 0:
+                # update row, col and block; the cell is only needed if it ends up being the single empty one
+                if row_zeros[r] == 0: row_first[r] = (r, c)
+                row_zeros[r] += 1
+                if col_zeros[c] == 0: col_first[c] = (r, c)
+                col_zeros[c] += 1
+                if block_zeros[b_idx] == 0: block_first[b_idx] = (r, c)
+                block_zeros[b_idx] += 1
+            else:  # update bitmasks (for heuristic 3)
+                # shift 1 by (val-1) so: 1→bit0, 2→bit1,....
+                mask = 1 << (val - 1)
+                row_mask[r] |= mask
+                col_mask[c] |= mask
+                block_mask[b_idx] |= mask
+
+        return {
+            'row_zeros': row_zeros, 'row_first_empty': row_first, 'row_mask': row_mask,
+            'col_zeros': col_zeros, 'col_first_empty': col_first, 'col_mask': col_mask,
+            'block_zeros': block_zeros, 'block_first_empty': block_first, 'block_mask': block_mask,
+        }
 
 
     @staticmethod
-    def calculate_sniping_score(analysis, my_allowed, opp_allowed):  # heuristic 1
+    def calculate_sniping_score(analysis, N, my_grid, opp_grid):  # heuristic 1
         """
         Analyzes the regions with exactly 1 empty cell and returns the score.
         :param analysis: output from get_region_status()
-        :param my_allowed: list tuples (r, c) of allowed squares for our agent
-        :param opp_allowed: list tuples (r, c) of allowed squares for the opponent
+        :param my_grid: flat N*N sequence, truthy at r * N + c if (r, c) is an allowed square for our agent
+        :param opp_grid: same for the opponent
         """
         score = 0.0
 
@@ -69,17 +101,22 @@ class Heuristics:
         W_SNIPE = 100.0 # reward for guaranteed point for me
         W_DEFEND = 120.0 # penalty for guaranteed point for opponent -- defense is prioritized
 
-        # we convert the lists to sets for O(1) lookup
-        my_set, opp_set = set(my_allowed), set(opp_allowed)
+        for zeros_key, first_key in (('row_zeros', 'row_first_empty'), ('col_zeros', 'col_first_empty'),
+                                     ('block_zeros', 'block_first_empty')):
+            family_zeros = analysis[zeros_key]
+            family_first = analysis[first_key]
 
-        all_regions = analysis['rows'] + analysis['cols'] + analysis['blocks']
+            # jump straight to the regions with exactly 1 empty cell (C-level index), usually there are few
+            i = -1
+            for _ in range(family_zeros.count(1)):
+                i = family_zeros.index(1, i + 1)
 
-        for region in all_regions:
-            if region['zeros'] == 1: # this is a critical region → who can reach the last cell?
-                target_cell = region['empty_indices'][0] # (r, c)
+                # this is a critical region → who can reach the last cell?
+                r, c = family_first[i]
+                idx = r * N + c
 
-                can_i_reach = target_cell in my_set
-                can_opp_reach = target_cell in opp_set
+                can_i_reach = my_grid[idx]
+                can_opp_reach = opp_grid[idx]
 
                 if can_i_reach and not can_opp_reach: score += W_SNIPE  # opportunity for us
                 elif can_opp_reach and not can_i_reach: score -= W_DEFEND  # threat from opp
@@ -91,92 +128,69 @@ class Heuristics:
 
 
     @staticmethod
-    def calculate_mobility_score(board, N, my_allowed, opp_allowed): # heuristic 2
+    def _allowed_grid(N, allowed):
+        """Helper: flat N*N bytearray with a 1 at r * N + c for every allowed square (r, c)"""
+        grid = bytearray(N * N)
+        for (r, c) in allowed:
+            grid[r * N + c] = 1
+        return grid
+
+    @staticmethod
+    def evaluate_fused(board, N, n, m, my_allowed, opp_allowed, analysis=None, my_grid=None, opp_grid=None):
         """
-        The mobility heuristic: rewards having empty squares to play in than the opponent
-        checks if the allowed square is actually empty (0) on the board
+        Computes sniping (1), mobility (2) and LRV (3) with a single pass over each allowed list
+        :param board: 1D array of integers representing the grid
+        :param my_allowed: list tuples (r, c) of allowed squares for our agent
+        :param opp_allowed: list tuples (r, c) of allowed squares for the opponent
+        :param analysis: output from get_region_status() if already known, scanned from the board otherwise
+        :param my_grid, opp_grid: the allowed squares as flat N*N membership grids if already known (only read at
+            empty squares), built from the lists otherwise
         """
         W_MOBILITY = 2.0 # TODO: move to config
 
-        # count valid empty squares for us
+        # scanner
+        if analysis is None:
+            analysis = Heuristics.get_region_status(board, N, n, m)
+        row_mask, col_mask, block_mask = analysis['row_mask'], analysis['col_mask'], analysis['block_mask']
+
+        # we convert the lists to grids for O(1) lookup by index (unless the caller keeps them up to date already)
+        if my_grid is None:
+            my_grid = Heuristics._allowed_grid(N, my_allowed)
+        if opp_grid is None:
+            opp_grid = Heuristics._allowed_grid(N, opp_allowed)
+        sniping = Heuristics.calculate_sniping_score(analysis, N, my_grid, opp_grid)
+
+        # our squares: mobility (empty squares to play in) and LRV (least remaining values) together
+        lrv_by_mask = _lrv_by_mask(N)
+        block_idx = make_tables(m, n)[0]
         my_count = 0
+        lrv = 0.0
         for (r, c) in my_allowed:
             idx = r * N + c
+            if board[idx] != 0: continue
+            my_count += 1
 
-            if board[idx] == 0:
-                my_count += 1
+            # valid options are the values not used yet in any of the three regions
+            lrv += lrv_by_mask[row_mask[r] | col_mask[c] | block_mask[block_idx[idx]]]
 
-        # count valid empty squares for opponent
+        # opponent squares: only mobility
         opp_count = 0
         for (r, c) in opp_allowed:
-            idx = r * N + c
-
-            if board[idx] == 0:
+            if board[r * N + c] == 0:
                 opp_count += 1
 
-        diff = my_count - opp_count
-        return W_MOBILITY * diff
-
-
-    @staticmethod
-    def _count_valid_options(used_mask, N):
-        """Helper: count how many bits are 0 (valid) in the mask up to N"""
-        count = 0
-        for i in range(N):
-            if not (used_mask & (1 << i)): # check if bit i is not set
-                count += 1
-        return count
-
-    @staticmethod
-    def calculate_lrv_score(board, analysis, N, n, m, my_allowed):
-        score = 0.0
-        blocks_per_row = N // m
-
-        for (r, c) in my_allowed:
-            if board[r * N + c] != 0: continue
-
-            b_row = r // n
-            b_col = c // m
-            b_idx = b_row * blocks_per_row + b_col
-
-            r_mask = analysis['rows'][r]['used_mask']
-            c_mask = analysis['cols'][c]['used_mask']
-            b_mask = analysis['blocks'][b_idx]['used_mask']
-
-            total_mask = r_mask | c_mask | b_mask
-            options = Heuristics._count_valid_options(total_mask, N)
-
-            # TODO: move to config
-            if options == 1:
-                score += 5.0  # single (very safe lol)
-            elif options == 2:
-                score += 2.0  # strong move
-            elif options > 2:
-                # lower returns for risky moves
-                score += (1.0 / options)
-            else:
-                # options == 0 (impossible state)
-                score -= 10.0  # bad move to be here
+        mobility = W_MOBILITY * (my_count - opp_count)
 
-        return score
+        total = sniping + mobility + lrv
+        return total
 
     @staticmethod
-    def evaluate_board(board, N, n, m, my_allowed, opp_allowed):
+    def evaluate_board(board, N, n, m, my_allowed, opp_allowed, analysis=None, my_grid=None, opp_grid=None):
         """
         Combines all heuristics into a single value
         """
-        # scanner
-        analysis = Heuristics.get_region_status(board, N, n, m)
-
-        # components
         # Note: sniping logic calculates score based on potential moves
         # we need to calculate current score diff if we had access to game_state.scores,
         # but since we are stateless, we assume the AI handles score diff via current_score
         # here we focus on future potential.
-
-        sniping = Heuristics.calculate_sniping_score(analysis, my_allowed, opp_allowed)
-        mobility = Heuristics.calculate_mobility_score(board, N, my_allowed, opp_allowed)
-        lrv = Heuristics.calculate_lrv_score(board, analysis, N, n, m, my_allowed)
-
-        total = sniping + mobility + lrv
-        return total
\ No newline at end of file
+        return Heuristics.evaluate_fused(board, N, n, m, my_allowed, opp_allowed, analysis, my_grid, opp_grid)
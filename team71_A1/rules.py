@@ -1,38 +1,151 @@
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def make_tables(m: int, n: int):
+    """
+    Per-cell lookup tables for a board with regions of m rows by n columns (as in SudokuBoard)
+    Returns (block_idx, row_of, col_of, block_cells):
+        block_idx[idx], row_of[idx], col_of[idx] = region index, row and column of the cell idx = r * N + c
+        block_cells[b] = the cell indices that make up region b
+    """
+    N = m * n
+    block_idx = tuple((r // m) * m + c // n for r in range(N) for c in range(N))
+    row_of = tuple(r for r in range(N) for _ in range(N))
+    col_of = tuple(c for _ in range(N) for c in range(N))
+
+    block_cells = [[] for _ in range(N)]
+    for idx, b_idx in enumerate(block_idx):
+        block_cells[b_idx].append(idx)
+
+    return block_idx, row_of, col_of, tuple(tuple(cells) for cells in block_cells)
+
+
+@lru_cache(maxsize=None)
+def neighbor_table(N: int):
+    """
+    neighbors[idx] = the cell indices of the (up to 8) squares adjacent to the cell idx = r * N + c,
+    i.e. the squares a player may play in after occupying idx
+    """
+    neighbors = []
+    for row in range(N):
+        for col in range(N):
+            cells = []
+            for dr in (-1, 0, 1):
+                for dc in (-1, 0, 1):
+                    if dr == 0 and dc == 0:
+                        continue
+                    r, c = row + dr, col + dc
+                    if 0 <= r < N and 0 <= c < N:
+                        cells.append(r * N + c)
+            neighbors.append(tuple(cells))
+    return tuple(neighbors)
+
+
 class LocalOracle:
     def __init__(self, board_object, taboo_moves):
         self.board = board_object
+        # compact copy of the board (one byte per square) that the search reads and updates through
+        # mark/unmark_constraints; slices of it are scanned with memchr instead of per-item compares
+        self.squares = bytearray(board_object.squares)
         self.N = board_object.N
         self.m = board_object.m
         self.n = board_object.n
+        self.block_idx, _, _, self.block_cells = make_tables(self.m, self.n)
 
         self.rows = [0] * self.N
         self.cols = [0] * self.N
         self.boxes = [0] * self.N
 
-        self.taboo_set = set()
-        if taboo_moves:
-            for move in taboo_moves:
-                r, c = move.square
-                self.taboo_set.add((r, c, move.value))
+        # number of empty squares per row/col/box, kept in sync by mark/unmark_constraints
+        self.row_zeros = [self.N] * self.N
+        self.col_zeros = [self.N] * self.N
+        self.box_zeros = [self.N] * self.N
+
+        # taboo moves packed into a single int key (r * N + c) * N + (val - 1), cheaper to hash than a tuple
+        self.taboo_set = frozenset(
+            (move.square[0] * self.N + move.square[1]) * self.N + move.value - 1 for move in taboo_moves or ()
+        )
 
         for i in range(self.N):
             for j in range(self.N):
                 idx = self.N * i + j
-                val = self.board.squares[idx]
+                val = self.squares[idx]
 
                 if val != 0:
                     self.mark_constraints(i, j, val)
 
     def get_box_index(self, r: int, c: int) -> int:
-        br = r // self.m
-        bc = c // self.n
-        return br * self.m + bc
+        return self.block_idx[self.N * r + c]
 
     def mark_constraints(self, r: int, c: int, val: int):
         mask = 1 << (val - 1)
+        b = self.get_box_index(r, c)
+        self.squares[self.N * r + c] = val
         self.rows[r] |= mask
         self.cols[c] |= mask
-        self.boxes[self.get_box_index(r, c)] |= mask
+        self.boxes[b] |= mask
+        self.row_zeros[r] -= 1
+        self.col_zeros[c] -= 1
+        self.box_zeros[b] -= 1
+
+    def unmark_constraints(self, r: int, c: int, val: int):
+        mask = ~(1 << (val - 1))
+        b = self.get_box_index(r, c)
+        self.squares[self.N * r + c] = 0
+        self.rows[r] &= mask
+        self.cols[c] &= mask
+        self.boxes[b] &= mask
+        self.row_zeros[r] += 1
+        self.col_zeros[c] += 1
+        self.box_zeros[b] += 1
+
+    def count_completed_regions(self, r: int, c: int) -> int:
+        """
+        Number of regions (row, col, box) that are full, among those containing the filled square (r,c)
+        """
+        N = self.N
+        squares = self.squares
+        row_start = r * N
+        count = 0
+
+        # each check is a single C-level scan over a slice instead of a per-cell Python predicate
+        if 0 not in squares[row_start:row_start + N]:
+            count += 1
+        if 0 not in squares[c::N]:
+            count += 1
+        if all(map(squares.__getitem__, self.block_cells[self.block_idx[row_start + c]])):
+            count += 1
+
+        return count
+
+    def region_status(self):
+        """
+        Same analysis as Heuristics.get_region_status, built from the incrementally maintained masks and
+        zero counts instead of a full board scan. The first empty cell is only located for regions with
+        exactly one empty square (the only ones the heuristics look at), other entries are None.
+        """
+        N = self.N
+        squares = self.squares
+
+        row_first = [None] * N
+        col_first = [None] * N
+        box_first = [None] * N
+        for i in range(N):
+            if self.row_zeros[i] == 1:
+                row_first[i] = (i, squares.index(0, i * N, (i + 1) * N) - i * N)
+            if self.col_zeros[i] == 1:
+                row = next(r for r in range(N) if squares[r * N + i] == 0)
+                col_first[i] = (row, i)
+            if self.box_zeros[i] == 1:
+                idx = next(idx for idx in self.block_cells[i] if squares[idx] == 0)
+                box_first[i] = divmod(idx, N)
+
+        return {
+            'row_zeros': self.row_zeros, 'row_first_empty': row_first, 'row_mask': self.rows,
+            'col_zeros': self.col_zeros, 'col_first_empty': col_first, 'col_mask': self.cols,
+            'block_zeros': self.box_zeros, 'block_first_empty': box_first, 'block_mask': self.boxes,
+        }
 
     def is_valid_sudoku_move(self, r: int, c: int, val: int) -> bool:
         mask = 1 << (val - 1)
@@ -48,18 +161,27 @@ class LocalOracle:
 
     def get_legal_moves(self, allowed_squares):
         legal_moves = []
+        N = self.N
+        squares = self.squares
+        full = (1 << N) - 1
+        taboo_set = self.taboo_set
 
         for (r, c) in allowed_squares:
-            if self.board.squares[self.N * r + c] != 0:
+            idx = N * r + c
+            if squares[idx] != 0:
                 continue
 
-            for val in range(1, self.N + 1):
-                if not self.is_valid_sudoku_move(r, c, val):
-                    continue
+            # enumerate only the values not used in the row, col or box (set bits of free)
+            free = full & ~(self.rows[r] | self.cols[c] | self.boxes[self.block_idx[idx]])
+            key_base = idx * N - 1
+            while free:
+                lsb = free & -free
+                free ^= lsb
+                val = lsb.bit_length()
 
-                if (r, c, val) in self.taboo_set:
+                if taboo_set and key_base + val in taboo_set:
                     continue
 
                 legal_moves.append((r, c, val))
 
-        return legal_moves
\ No newline at end of file
+        return legal_moves
@@ -2,21 +2,56 @@
 #  Software License, (See accompanying file LICENSE or copy at
 #  https://www.gnu.org/licenses/gpl-3.0.txt)
 
-import copy
+import random
+from functools import lru_cache
+
 from competitive_sudoku.sudoku import GameState, Move
 import competitive_sudoku.sudokuai
 
-from .rules import LocalOracle
+from .rules import LocalOracle, neighbor_table
 from .heuristics import Heuristics
 
+# transposition table entry flags: the stored score is exact, a lower bound or an upper bound
+TT_EXACT, TT_LOWER, TT_UPPER = 0, 1, 2
+
+
+@lru_cache(maxsize=None)
+def zobrist_table(N: int):
+    """
+    Random 64-bit keys indexed by ((idx * N + val - 1) * 2 + player - 1), one per (square, value, player).
+    The player is part of the key because it decides whose territory the square extends.
+    """
+    rng = random.Random(N)  # fixed seed: hashes are reproducible between runs
+    return tuple(rng.getrandbits(64) for _ in range(N * N * N * 2))
+
+
 class SudokuAI(competitive_sudoku.sudokuai.SudokuAI):
     """
     Sudoku AI that computes the best move using Minimax with Alpha-Beta pruning
     and Iterative Deepening.
     """
 
+    # points for completing 0, 1, 2 or 3 regions with a single move
+    _POINTS_BY_REGIONS = (0, 1, 3, 7)
+
     def __init__(self):
         super().__init__()
+        # stack of (idx, prev_val, score_add, player) entries pushed by apply_move
+        self._move_stack = []
+        # row/col/box bitmasks of the searched position, kept in sync by apply_move/undo_move
+        self._oracle = None
+        # per player (index 1 and 2): for every cell, the number of reasons it is allowed
+        # (initially allowed + occupied neighbours), None in a classic game
+        self._reach = None
+        self._squares = None
+        self._neighbors = None
+        # Zobrist hash of the moves applied since the root, and the transposition table
+        # (hash, score diff) -> (depth, score, flag, best_move)
+        self._zobrist = None
+        self._hash = 0
+        self._tt = {}
+        # killer moves: per ply (number of moves applied since the root), the last move that caused a cutoff
+        self._killers = []
 
     def compute_best_move(self, game_state: GameState) -> None:
         """
@@ -26,23 +61,31 @@ class SudokuAI(competitive_sudoku.sudokuai.SudokuAI):
 
         my_player_id = game_state.current_player
 
-        oracle = LocalOracle(game_state.board, game_state.taboo_moves)
-        allowed_squares = game_state.player_squares()
+        # scan the board once, the search updates the bitmasks incrementally from here on
+        self._oracle = LocalOracle(game_state.board, game_state.taboo_moves)
+        self._init_reach(game_state)
+        self._zobrist = zobrist_table(game_state.board.N)
+        self._hash = 0
+        self._tt = {}
+        self._killers = [None] * (len(game_state.board.squares) + 1)
+        allowed_squares = self._player_squares(game_state, game_state.current_player)
         
-        # Generate legal moves 
-        legal_move_tuples = oracle.get_legal_moves(allowed_squares)
+        # Generate legal moves, as (r, c, val) tuples: Move objects are only built for propose_move
+        legal_moves = self._oracle.get_legal_moves(allowed_squares)
 
-        if not legal_move_tuples:
+        if not legal_moves:
             return 
 
-        legal_moves = [Move((r, c), val) for r, c, val in legal_move_tuples]
-
         # sort: check scoring moves first (greedy fallback)
-        legal_moves.sort(key=lambda m: self._get_immediate_points(game_state, m), reverse=True)
+        legal_moves.sort(key=self._get_immediate_points, reverse=True)
 
 
         # Propose the first valid move immediately as a fallback
-        self.propose_move(legal_moves[0])
+        r, c, val = legal_moves[0]
+        self.propose_move(Move((r, c), val))
+
+        # the search mutates game_state in place (make/undo), keep a cheap copy to fall back on
+        snapshot = self._snapshot(game_state)
 
         # Iterative Deepening Loop
         depth = 1
@@ -52,21 +95,28 @@ class SudokuAI(competitive_sudoku.sudokuai.SudokuAI):
             alpha = float('-inf')
             beta = float('inf')
 
-            for move in legal_moves:
-                # TODO: mplement make/undo move to avoid deepcopy
-                next_state = copy.deepcopy(game_state)
-                self.apply_move(next_state, move)
+            try:
+                for move in legal_moves:
+                    self.apply_move(game_state, move)
+                    score = self.minimax(game_state, depth - 1, alpha, beta, False, my_player_id)
+                    self.undo_move(game_state)
 
-                score = self.minimax(next_state, depth - 1, alpha, beta, False, my_player_id)
+                    if score > best_score:
+                        best_score = score
+                        best_move = move
 
-                if score > best_score:
-                    best_score = score
-                    best_move = move
-
-                alpha = max(alpha, best_score)
+                    alpha = max(alpha, best_score)
+            finally:
+                # a no-op after a clean iteration, repairs the state if the search raised halfway
+                self._restore(game_state, snapshot)
 
             if best_move:
-                self.propose_move(best_move)
+                r, c, val = best_move
+                self.propose_move(Move((r, c), val))
+
+                # search the best move of this iteration first in the next one
+                legal_moves.remove(best_move)
+                legal_moves.insert(0, best_move)
 
             depth += 1
             # print(f'AGENT depth has reached: {depth}')
@@ -78,148 +128,237 @@ class SudokuAI(competitive_sudoku.sudokuai.SudokuAI):
         if depth == 0:  # base case 1: reached max depth
             return self.evaluate_board(game_state, my_player_id)
 
+        # transposition table: the same position can be reached through different move orders.
+        # scores are part of the key since the order of the moves decides who got the points
+        tt_key = (self._hash, game_state.scores[0] - game_state.scores[1])
+        tt_move = None
+        entry = self._tt.get(tt_key)
+        if entry is not None:
+            tt_depth, tt_score, tt_flag, tt_move = entry
+            if tt_depth >= depth:
+                if tt_flag == TT_EXACT:
+                    return tt_score
+                if tt_flag == TT_LOWER:
+                    alpha = max(alpha, tt_score)
+                else:
+                    beta = min(beta, tt_score)
+                if beta <= alpha:
+                    return tt_score
+        alpha_orig, beta_orig = alpha, beta
+
         # base case 2: no moves possible (game over or boxed in)
-        oracle = LocalOracle(game_state.board, game_state.taboo_moves)
-        allowed = game_state.player_squares()
+        allowed = self._player_squares(game_state, game_state.current_player)
         
         # If no moves allowed, evaluate state immediately
         if not allowed:
             return self.evaluate_board(game_state, my_player_id)
 
-        move_tuples = oracle.get_legal_moves(allowed)
-        if not move_tuples:
+        moves = self._oracle.get_legal_moves(allowed)
+        if not moves:
             return self.evaluate_board(game_state, my_player_id)
 
-        moves = [Move((r, c), val) for r, c, val in move_tuples]
         # optim: sort moves by immediate points to maximize a-b pruning efficiency
-        moves.sort(key=lambda m: self._get_immediate_points(game_state, m), reverse=True)
-
-
+        moves.sort(key=self._get_immediate_points, reverse=True)
+
+        # try first: the killer move of this ply (it often cuts off again in sibling positions),
+        # and before that the best move found for this position before (e.g. at a lower depth)
+        ply = len(self._move_stack)
+        killer = self._killers[ply]
+        if killer is not None and killer != tt_move and killer in moves:
+            moves.remove(killer)
+            moves.insert(0, killer)
+        if tt_move is not None and tt_move in moves:
+            moves.remove(tt_move)
+            moves.insert(0, tt_move)
+
+        best_move = None
         if is_maximizing:
             max_eval = float('-inf')
             for move in moves:
-                next_state = copy.deepcopy(game_state)
-                self.apply_move(next_state, move)
-                
-                eval_score = self.minimax(next_state, depth - 1, alpha, beta, False, my_player_id)
-                max_eval = max(max_eval, eval_score)
+                self.apply_move(game_state, move)
+                eval_score = self.minimax(game_state, depth - 1, alpha, beta, False, my_player_id)
+                self.undo_move(game_state)
+
+                if eval_score > max_eval:
+                    max_eval = eval_score
+                    best_move = move
                 alpha = max(alpha, eval_score)
                 if beta <= alpha:
+                    self._killers[ply] = move
                     break 
-            return max_eval
+            best_score = max_eval
         else:
             min_eval = float('inf')
             for move in moves:
-                next_state = copy.deepcopy(game_state)
-                self.apply_move(next_state, move)
-                
-                eval_score = self.minimax(next_state, depth - 1, alpha, beta, True, my_player_id)
+                self.apply_move(game_state, move)
+                eval_score = self.minimax(game_state, depth - 1, alpha, beta, True, my_player_id)
+                self.undo_move(game_state)
 
-                min_eval = min(min_eval, eval_score)
+                if eval_score < min_eval:
+                    min_eval = eval_score
+                    best_move = move
                 beta = min(beta, eval_score)
                 if beta <= alpha:
+                    self._killers[ply] = move
                     break
-            return min_eval
+            best_score = min_eval
+
+        if best_score <= alpha_orig:
+            flag = TT_UPPER
+        elif best_score >= beta_orig:
+            flag = TT_LOWER
+        else:
+            flag = TT_EXACT
+        self._tt[tt_key] = (depth, best_score, flag, best_move)
 
+        return best_score
 
-    def apply_move(self, game_state: GameState, move: Move):
+
+    def apply_move(self, game_state: GameState, move: tuple):
         """
-        Helper to apply a move to the game state copy updates board, territory, and scores
+        Helper to apply a move (r, c, val) to the game state in place: updates board, territory, and scores.
+        Every call must be matched by a call to undo_move.
         """
-        r, c = move.square
-        val = move.value
-        game_state.board.put(move.square, val)
+        r, c, val = move
+        idx = r * game_state.board.N + c
+        game_state.board.squares[idx] = val
+        self._oracle.mark_constraints(r, c, val)
 
         # update territory
         if game_state.current_player == 1:
             if game_state.occupied_squares1 is not None:
-                game_state.occupied_squares1.append(move.square)
+                game_state.occupied_squares1.append((r, c))
         else:
             if game_state.occupied_squares2 is not None:
-                game_state.occupied_squares2.append(move.square)
+                game_state.occupied_squares2.append((r, c))
 
-        # calc points
-        # since the value is already in the board, we pass is_hypothetical=False
-        regions_completed = self._check_regions_completion(
-            game_state.board, r, c, is_hypothetical=False
-        )
+        if self._reach is not None:
+            reach = self._reach[game_state.current_player]
+            for nb in self._neighbors[idx]:
+                reach[nb] += 1
+
+        # calc points (the value is already in the board)
+        regions_completed = self._oracle.count_completed_regions(r, c)
 
         score_add = self._map_points_to_score(regions_completed)
 
         # update score
-        player_idx = game_state.current_player - 1
-        game_state.scores[player_idx] += score_add
+        player = game_state.current_player
+        game_state.scores[player - 1] += score_add
+
+        # remember what to revert (the square was empty before the move)
+        self._move_stack.append((idx, 0, score_add, player))
+        self._hash ^= self._zobrist[((idx * game_state.board.N + val - 1) << 1) + player - 1]
 
         # switch turns
-        game_state.current_player = 3 - game_state.current_player
+        game_state.current_player = 3 - player
 
-    def _get_immediate_points(self, game_state: GameState, move: Move) -> int:
+    def undo_move(self, game_state: GameState):
         """
-        heuristic helper: calculates potential points for sorting
+        Reverts the last move applied with apply_move
         """
-        r, c = move.square
-        # move is not on the board yet, so we pass is_hypothetical=True
-        regions_completed = self._check_regions_completion(
-            game_state.board, r, c, is_hypothetical=True
-        )
-        return self._map_points_to_score(regions_completed)
+        idx, prev_val, score_add, player = self._move_stack.pop()
+        N = game_state.board.N
+        r, c = divmod(idx, N)
+        val = game_state.board.squares[idx]
+        self._hash ^= self._zobrist[((idx * N + val - 1) << 1) + player - 1]
+        self._oracle.unmark_constraints(r, c, val)
+        game_state.board.squares[idx] = prev_val
+
+        # restore territory
+        if player == 1:
+            if game_state.occupied_squares1 is not None:
+                game_state.occupied_squares1.pop()
+        else:
+            if game_state.occupied_squares2 is not None:
+                game_state.occupied_squares2.pop()
 
-    def _check_regions_completion(self, board, r, c, is_hypothetical: bool) -> int:
-        """
-        shared logic to check how many regions (row, col, block) are completed by a move at (r,c)
+        if self._reach is not None:
+            reach = self._reach[player]
+            for nb in self._neighbors[idx]:
+                reach[nb] -= 1
 
-        is_hypothetical:
-            True = (r,c) is currently 0 in board.squares, but we pretend it's filled
-            False = (r,c) is already filled in board.squares
-        """
-        N = board.N
-        n = board.n
-        m = board.m
-        board_arr = board.squares
-        points = 0
-
-        target_idx = r * N + c
-
-        # helper predicate to check if a cell is filled
-        # if hypothetical, target_idx counts as filled even if 0
-        def is_filled(idx):
-            return board_arr[idx] != 0 or (is_hypothetical and idx == target_idx)
-
-        # check row
-        row_start = r * N
-        if all(is_filled(i) for i in range(row_start, row_start + N)):
-            points += 1
-
-        # check col
-        if all(is_filled(c + i * N) for i in range(N)):
-            points += 1
-
-        # check block
-        b_row_start = (r // n) * n
-        b_col_start = (c // m) * m
-
-        block_full = True
-        for bi in range(n):
-            for bj in range(m):
-                idx = (b_row_start + bi) * N + (b_col_start + bj)
-                if not is_filled(idx):
-                    block_full = False
-                    break
-            if not block_full: break
+        # restore score and turn
+        game_state.scores[player - 1] -= score_add
+        game_state.current_player = player
 
-        if block_full:
-            points += 1
+    @staticmethod
+    def _snapshot(game_state: GameState) -> tuple:
+        """
+        Copies the parts of the game state the search mutates (flat list slices, no deepcopy)
+        """
+        occupied1 = game_state.occupied_squares1
+        occupied2 = game_state.occupied_squares2
+        return (game_state.board.squares[:],
+                None if occupied1 is None else occupied1[:],
+                None if occupied2 is None else occupied2[:],
+                game_state.scores[:],
+                game_state.current_player)
+
+    @staticmethod
+    def _restore(game_state: GameState, snapshot: tuple):
+        """
+        Restores a snapshot taken with _snapshot, in place so that references to the lists stay valid
+        """
+        squares, occupied1, occupied2, scores, current_player = snapshot
+        game_state.board.squares[:] = squares
+        if occupied1 is not None:
+            game_state.occupied_squares1[:] = occupied1
+        if occupied2 is not None:
+            game_state.occupied_squares2[:] = occupied2
+        game_state.scores[:] = scores
+        game_state.current_player = current_player
+
+    def _init_reach(self, game_state: GameState):
+        """
+        Builds the per-player reach counts once per search, so that the allowed squares can be derived
+        without game_state.player_squares() (which rebuilds them from the occupied squares every call)
+        """
+        N = game_state.board.N
+        self._neighbors = neighbor_table(N)
+        self._squares = tuple((r, c) for r in range(N) for c in range(N))
+
+        if game_state.is_classic_game():
+            self._reach = None
+            return
+
+        self._reach = [None, [0] * (N * N), [0] * (N * N)]
+        for player, allowed, occupied in ((1, game_state.allowed_squares1, game_state.occupied_squares1),
+                                          (2, game_state.allowed_squares2, game_state.occupied_squares2)):
+            reach = self._reach[player]
+            for (r, c) in allowed or ():
+                reach[r * N + c] += 1
+            for (r, c) in occupied or ():
+                for nb in self._neighbors[r * N + c]:
+                    reach[nb] += 1
+
+    def _player_squares(self, game_state: GameState, player: int):
+        """
+        Same result as game_state.player_squares() for the given player (sorted empty allowed squares,
+        None if all squares are allowed), read from the incrementally maintained reach counts
+        """
+        if self._reach is None:
+            return None
+        return [square for square, count, val in zip(self._squares, self._reach[player], self._oracle.squares)
+                if count and not val]
 
-        return points
+    def _get_immediate_points(self, move: tuple) -> int:
+        """
+        heuristic helper: calculates potential points for sorting
+        a move completes exactly the regions in which its square is the last empty one, so the
+        oracle's zero counts give the same result as count_completed_regions in O(1)
+        """
+        oracle = self._oracle
+        r, c, _ = move
+        regions_completed = ((oracle.row_zeros[r] == 1) + (oracle.col_zeros[c] == 1)
+                             + (oracle.box_zeros[oracle.get_box_index(r, c)] == 1))
+        return self._POINTS_BY_REGIONS[regions_completed]
 
     def _map_points_to_score(self, regions_count: int) -> int:
         """
         maps the scores to regions (1, 3, 7)
         """
-        if regions_count == 1: return 1
-        if regions_count == 2: return 3
-        if regions_count == 3: return 7
-        return 0
+        return self._POINTS_BY_REGIONS[regions_count]
 
     def evaluate_board(self, game_state: GameState, my_player_id: int) -> float:
         """
@@ -237,30 +376,25 @@ class SudokuAI(competitive_sudoku.sudokuai.SudokuAI):
 
         # 2 - prepare data for the heuristics class
         # note: heuristics needs to know the allowed squares for both players to calculate the threats
-        # game_state.player_squares only gives squares for the current player
-        # we perform a temporary flip to get both lists
-
-        org_player = game_state.current_player
-
-        # get p1 moves
-        game_state.current_player = my_player_id
-        p1_allowed = game_state.player_squares()
-
-        # get p2 moves
-        game_state.current_player = 3 - my_player_id # switch 1→2 or 2→1
-        p2_allowed = game_state.player_squares()
-
-        # restore
-        game_state.current_player = org_player
+        p1_allowed = self._player_squares(game_state, my_player_id)
+        p2_allowed = self._player_squares(game_state, 3 - my_player_id) # switch 1→2 or 2→1
+        # the reach counts double as membership grids: nonzero at an empty square means it is allowed
+        p1_grid = p2_grid = None
+        if self._reach is not None:
+            p1_grid = self._reach[my_player_id]
+            p2_grid = self._reach[3 - my_player_id]
 
         # 3 - calculate heuristic potential → p1 as us and p2 as opp → positive result means p1 has better potential
         heuristic_val = Heuristics.evaluate_board(
-            board=game_state.board.squares,
+            board=self._oracle.squares,
             N=game_state.board.N,
             n=game_state.board.n,
             m=game_state.board.m,
             my_allowed=p1_allowed,
-            opp_allowed=p2_allowed
+            opp_allowed=p2_allowed,
+            analysis=self._oracle.region_status(),  # incremental, no board rescan per leaf
+            my_grid=p1_grid,
+            opp_grid=p2_grid
         )
 
         # total eval